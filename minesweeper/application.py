@@ -7,7 +7,7 @@ from prompt_toolkit.layout.controls import UIContent, UIControl
 
 import numpy as np
 
-from .field import Field, initialize_mines
+from .field import Field
 from . import icons
 
 
@@ -17,54 +17,59 @@ class GameStatus(Enum):
     Won = "winnar"
 
 
-def render_field(field: Field):
-    representation = []
-    for row_idx in range(field.rows):
-        row_chars = []
-        for col_idx in range(field.cols):
-            if not field.revealed[row_idx, col_idx]:
-                if field.flagged[row_idx, col_idx]:
-                    row_chars.append(icons.FLAG)
-                else:
-                    row_chars.append(icons.UNKNOWN)
-            elif field.mines[row_idx, col_idx]:
-                row_chars.append(icons.MINE)
-            elif field.adjacency_matrix[row_idx, col_idx] == 0:
-                row_chars.append(icons.BLANK)
-            else:
-                row_chars.append(str(field.adjacency_matrix[row_idx, col_idx]))
-        
-        representation.append(row_chars)
-    return representation
+def render_field(field: Field, out=None):
+    """
+    Build the character grid for the field in a single vectorized pass,
+    rather than looking up each square individually. If ``out`` is given,
+    the grid is written into it instead of a new array.
+    """
+    revealed = field.revealed
+    flagged = field.flagged
+
+    chars = out if out is not None else np.empty((field.rows, field.cols), dtype='<U1')
+    chars[...] = icons.UNKNOWN
+    chars[~revealed & flagged] = icons.FLAG
+
+    # Nothing can be revealed until the mines have been laid down.
+    if field.initialized:
+        mines = field.mines
+        adjacency = field.adjacency_matrix
+        numbered = revealed & ~mines & (adjacency != 0)
+
+        chars[revealed & mines] = icons.MINE
+        chars[revealed & ~mines & (adjacency == 0)] = icons.BLANK
+        chars[numbered] = field.adjacency_strings[numbered]
 
+    return chars
 
-def _convert_to_ptkit_representation(raw_representation, cursor_row, cursor_col, auto_reveal_enabled):
+
+def _allocate_line_buffer(rows, cols):
     """
-    Convert intermediate field representation into one that prompt toolkit
-    understands.
+    Allocate a buffer for a character grid whose rows are joined with
+    spaces. Returns a writable view of just the character cells, and a view
+    of the same buffer as one string per row.
     """
-    as_lines = [' '.join(line) for line in raw_representation]
+    line_width = 2 * cols - 1
+    buf = np.full((rows, line_width), ' ', dtype='<U1')
+    return buf[:, 0::2], buf.view(f'<U{line_width}').reshape(rows)
 
-    # Convert into those style/string tuples:
-    ptkit_lines = [
-        [("", line)]
-        for line in as_lines
-    ]
 
-    _highlight_cursor_location(
-        cursor_row, 
-        cursor_col, 
-        "fg:ansiblack bg:ansigreen", 
-        as_lines, 
-        ptkit_lines
-    )
+def _join_rows(chars):
+    """Join each row of a character grid with spaces."""
+    cells, lines = _allocate_line_buffer(*chars.shape)
+    cells[...] = chars
+    return lines.tolist()
 
-    full_content = (
-        _generate_instruction_header(auto_reveal_enabled) + 
-        ptkit_lines
-    )
 
-    return full_content
+def _convert_to_ptkit_representation(as_lines):
+    """
+    Convert rendered lines into the style/string tuples that prompt toolkit
+    understands.
+    """
+    return [
+        [("", line)]
+        for line in as_lines
+    ]
 
 
 def _highlight_cursor_location(cursor_row, cursor_col, cursor_style, prerendered, rendered):
@@ -82,7 +87,7 @@ def _highlight_cursor_location(cursor_row, cursor_col, cursor_style, prerendered
     rendered[cursor_row] = new_line
 
 
-def _generate_instruction_header(auto_reveal_enabled):
+def _build_instruction_header(auto_reveal_enabled):
     return [
         [("", "Instructions")],
         [("", "------------")],
@@ -95,21 +100,35 @@ def _generate_instruction_header(auto_reveal_enabled):
     ]
 
 
-def render_death_screen(minefield, cursor_row, cursor_col, auto_reveal_enabled):
-    """Show the death screen."""
-    header = _generate_instruction_header(auto_reveal_enabled)
-    prerendered = [" ".join(f" {icons.MINE}"[flag] for flag in row) for row in minefield]
-    rendered = [[("", line)] for line in prerendered]
-    _highlight_cursor_location(cursor_row, cursor_col, "fg:ansiwhite bg:ansired", prerendered, rendered)
+# The header only ever comes in these two flavors, so build them up front.
+# Callers must treat them as read-only.
+_HEADER_NORMAL = _build_instruction_header(auto_reveal_enabled=False)
+_HEADER_AUTO = _build_instruction_header(auto_reveal_enabled=True)
+
+
+def _generate_instruction_header(auto_reveal_enabled):
+    return _HEADER_AUTO if auto_reveal_enabled else _HEADER_NORMAL
 
-    rendered.extend([
-        [("", "")],
-        [("", "Owie-wowie, you died :(")]
-    ])
-    return header + rendered
 
+_WIN_SCREEN = [
+    [("", "u r winner!")]
+]
 
-_KEYBINDINGS = key_binding.KeyBindings()
+
+_DEATH_FOOTER = [
+    [("", "")],
+    [("", "Owie-wowie, you died :(")]
+]
+
+
+def render_death_screen(minefield):
+    """
+    Lay out the mines for the death screen, without the cursor. Returns both
+    the plain lines and their prompt toolkit representation, so that the
+    cursor can be highlighted separately.
+    """
+    prerendered = _join_rows(np.where(minefield, icons.MINE, " "))
+    return prerendered, _convert_to_ptkit_representation(prerendered)
 
 
 class FieldController(UIControl):
@@ -121,11 +140,26 @@ class FieldController(UIControl):
         self._cursor_col = 0
         self._auto_reveal = False
 
-        _KEYBINDINGS.add(Keys.Up)(lambda _: self._move_cursor_up())
-        _KEYBINDINGS.add(Keys.Down)(lambda _: self._move_cursor_down())
-        _KEYBINDINGS.add(Keys.Right)(lambda _: self._move_cursor_right())
-        _KEYBINDINGS.add(Keys.Left)(lambda _: self._move_cursor_left())
-        _KEYBINDINGS.add(Keys.Any)(self.handle_action)
+        # The board size is fixed for the whole game, so the field is always
+        # rendered into the same buffer, which doubles as its joined lines.
+        self._field_cells, self._field_lines = _allocate_line_buffer(field.rows, field.cols)
+
+        # Rendered field lines, kept between frames so that cursor-only
+        # moves don't have to re-render the whole field.
+        self._cached_prerendered = None
+        self._cached_ptkit_lines = None
+        self._rendered_version = None
+        self._highlighted_row = None
+
+        # The last content handed to prompt_toolkit, along with the state it
+        # was built from. It gets asked for content far more often than any
+        # of that state changes.
+        self._last_content = None
+        self._last_content_key = None
+
+        # The mines don't move once the game is lost, so the death screen
+        # only needs laying out once.
+        self._death_screen = None
 
     def _move_cursor_up(self):
         self._cursor_row = max(0, self._cursor_row - 1)
@@ -157,42 +191,91 @@ class FieldController(UIControl):
         elif key == 'q':
             self._auto_reveal = not self._auto_reveal
 
+    def _render_field_lines(self):
+        """
+        Render the field, re-using the previous frame unless the field has
+        changed since. On cursor moves only the affected lines are redone.
+        """
+        if self._field.version != self._rendered_version:
+            render_field(self._field, out=self._field_cells)
+            self._cached_prerendered = self._field_lines.tolist()
+            self._cached_ptkit_lines = _convert_to_ptkit_representation(
+                self._cached_prerendered
+            )
+            self._rendered_version = self._field.version
+        elif self._highlighted_row is not None:
+            # Put the previously highlighted line back the way it was.
+            self._cached_ptkit_lines[self._highlighted_row] = [
+                ("", self._cached_prerendered[self._highlighted_row])
+            ]
+
+        _highlight_cursor_location(
+            self._cursor_row,
+            self._cursor_col,
+            "fg:ansiblack bg:ansigreen",
+            self._cached_prerendered,
+            self._cached_ptkit_lines
+        )
+        self._highlighted_row = self._cursor_row
+
+        return self._cached_ptkit_lines
+
     def evaluate_win_condition(self):
         """
-        The game is won when the inverse of the revelation matrix exactly 
-        matches the mine matrix.
+        The game is won when every square without a mine has been revealed.
         """
         if self._status == GameStatus.Lost:
             return
-        
-        if not self._field.initialized:
-            return
 
-        revealed = ~self._field.revealed.astype(bool)
-        mined = self._field.mines.astype(bool)
-        if np.all(mined == revealed):
+        if self._field.is_won:
             self._status = GameStatus.Won
 
     def create_content(self, width: int, height: int) -> UIContent:
         self.evaluate_win_condition()
 
+        content_key = (
+            self._cursor_row,
+            self._cursor_col,
+            self._status,
+            self._auto_reveal,
+            self._field.version
+        )
+        if content_key != self._last_content_key:
+            self._last_content = self._build_content()
+            self._last_content_key = content_key
+
+        return self._last_content
+
+    def _build_content(self) -> UIContent:
         if self._status == GameStatus.Lost:
-            death = render_death_screen(self._field.mines, self._cursor_row, self._cursor_col, self._auto_reveal)
+            if self._death_screen is None:
+                self._death_screen = render_death_screen(self._field.mines)
+            prerendered, base_lines = self._death_screen
+
+            rendered = list(base_lines)
+            _highlight_cursor_location(self._cursor_row, self._cursor_col, "fg:ansiwhite bg:ansired", prerendered, rendered)
+            death = (
+                _generate_instruction_header(self._auto_reveal) +
+                rendered +
+                _DEATH_FOOTER
+            )
             return UIContent(
-                get_line=lambda line_no: death[line_no],
+                get_line=death.__getitem__,
                 line_count=len(death)
             )
         elif self._status == GameStatus.Won:
             return UIContent(
-                get_line=lambda line_no: [[("", "u r winner!")]][line_no],
-                line_count=1
+                get_line=_WIN_SCREEN.__getitem__,
+                line_count=len(_WIN_SCREEN)
             )
 
-        field_repr = render_field(self._field)
-        full_content = _convert_to_ptkit_representation(field_repr, self._cursor_row, self._cursor_col, self._auto_reveal)
+        full_content = (
+            _generate_instruction_header(self._auto_reveal) +
+            self._render_field_lines()
+        )
 
         return UIContent(
-            get_line=lambda line_no: full_content[line_no],
+            get_line=full_content.__getitem__,
             line_count=len(full_content)
         )
 
@@ -200,14 +283,24 @@ class FieldController(UIControl):
 def create_app(rows, cols, mine_ratio):
     field = Field(num_rows=rows, num_cols=cols, mine_ratio=mine_ratio)
     main_control = FieldController(field)
+
+    # Each app gets its own bindings, so that creating another app doesn't
+    # pile more handlers onto a shared registry.
+    key_bindings = key_binding.KeyBindings()
+    key_bindings.add(Keys.Up)(lambda _: main_control._move_cursor_up())
+    key_bindings.add(Keys.Down)(lambda _: main_control._move_cursor_down())
+    key_bindings.add(Keys.Right)(lambda _: main_control._move_cursor_right())
+    key_bindings.add(Keys.Left)(lambda _: main_control._move_cursor_left())
+    key_bindings.add(Keys.Any)(main_control.handle_action)
+
     app = application.Application(
         layout=Layout(
             Window(content=main_control, width=800, height=600)
         ),
-        key_bindings=_KEYBINDINGS
+        key_bindings=key_bindings
     )
 
-    @_KEYBINDINGS.add(Keys.ControlC)
+    @key_bindings.add(Keys.ControlC)
     def quit_game(event):
         app.exit()
 
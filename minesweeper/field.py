@@ -1,37 +1,58 @@
-from itertools import product
-import time
-
 import numpy as np
-from scipy.ndimage import convolve
+from scipy.ndimage import binary_dilation, label
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+_RNG = np.random.default_rng()
+
+# A square and its eight neighbors, used as the structuring element when
+# flooding out from a picked square.
+_NEIGHBORHOOD = np.ones((3, 3), dtype=bool)
 
 
 def initialize_mines(rows, cols, mine_ratio):
     total_squares = rows * cols
     num_mines = round(total_squares * mine_ratio)
-    mines = np.array(
-        [1] * num_mines + [0] * (total_squares - num_mines)
-    )
-    np.random.seed(int(time.time()))
-    np.random.shuffle(mines)
+    mine_indices = _RNG.choice(total_squares, size=num_mines, replace=False)
+    mines = np.zeros(total_squares, dtype=bool)
+    mines[mine_indices] = True
 
     return np.reshape(mines, (rows, cols))
 
 
+def _count_neighborhood(squares):
+    """
+    Count, for every square, how many squares in its 3x3 neighborhood
+    (itself included) are set.
+
+    With a 3x3 box kernel this is just the sum of the nine shifted copies
+    of the padded field, which is cheaper than a general convolution. The
+    counts never exceed 9, so they are summed up as bytes.
+    """
+    rows, cols = squares.shape
+    padded = np.pad(squares.astype(np.uint8), 1, mode='constant', constant_values=0)
+    adjacency = np.zeros((rows, cols), dtype=np.uint8)
+    for row_offset in range(3):
+        for col_offset in range(3):
+            adjacency += padded[row_offset:row_offset + rows, col_offset:col_offset + cols]
+
+    return adjacency.astype(int)
+
+
 def generate_adjacency_matrix(mines):
     """
     Given the minefield, generate the adjacency matrix, 
     which shows for each non-mined square how many mines 
     are next to it.
     """
-    return convolve(
-        mines,
-        np.ones((3, 3), dtype=int),
-        mode='constant',
-        cval=0
-    ).astype(int)
+    return _count_neighborhood(mines)
 
 
-def reveal_square(flagged, adjacency_matrix, revealed, row_idx, col_idx, auto_reveal):
+def reveal_square(flagged, adjacency_matrix, revealed, row_idx, col_idx, auto_reveal, adjacent_flags=None):
     """
     Emulates the behavior of clicking on a square in minesweeper. Behavior varies
     based on the value of ``auto_reveal``.
@@ -41,106 +62,125 @@ def reveal_square(flagged, adjacency_matrix, revealed, row_idx, col_idx, auto_re
 
     If ``auto_reveal`` is set to True, it will auto-reveal squares if the picked
     square has the appropriate number of mines flagged.   
-    """
-    num_rows, num_cols = flagged.shape
 
-    to_check = [(row_idx, col_idx)]
-    already_checked = set()
-    update_matrix = np.zeros(flagged.shape, dtype=int)
-    update_matrix[row_idx, col_idx] = 1
+    ``adjacent_flags`` holds the number of flags around each square. It is
+    counted from ``flagged`` if not given.
+    """
+    update_matrix = np.zeros(flagged.shape, dtype=bool)
+    update_matrix[row_idx, col_idx] = True
 
     if not auto_reveal and adjacency_matrix[row_idx, col_idx] != 0:
         return update_matrix
 
-    while len(to_check) > 0:
-        curr_row, curr_col = to_check.pop()
-        already_checked.add((curr_row, curr_col))
-        adjacent_squares = set(product(
-            np.clip(np.arange(curr_row - 1, curr_row + 2), 0, num_rows - 1, dtype=int),
-            np.clip(np.arange(curr_col - 1, curr_col + 2), 0, num_cols - 1, dtype=int)
-        ))
-
-        row_indexer, col_indexer = np.array(list(adjacent_squares)).T
-        adjacent_flagged = flagged[row_indexer, col_indexer]
-
-        # If number of adjacent flags is equal to or less than indicated number of
-        # adjacent mines, reveal the unflagged neighbors as well. We are essentially
-        # performing a breadth-first search here.
-        if sum(adjacent_flagged) >= adjacency_matrix[curr_row, curr_col]:
-            for coord in zip(row_indexer, col_indexer):
-                can_add = (
-                    (coord not in already_checked) and
-                    not revealed[coord] and
-                    not flagged[coord]
-                )
+    if adjacent_flags is None:
+        adjacent_flags = _count_neighborhood(flagged)
 
-                if can_add:
-                    to_check.append(coord)
-        update_matrix[curr_row, curr_col] = 1
+    return _flood_reveal(flagged, adjacent_flags, adjacency_matrix, revealed, row_idx, col_idx)
+
+
+def _flood_reveal_labelled(flagged, adjacent_flags, adjacency_matrix, revealed, row_idx, col_idx):
+    """
+    Reveal outward from the picked square. If number of adjacent flags is
+    equal to or greater than the indicated number of adjacent mines, a square
+    also reveals its unflagged neighbors.
+
+    Rather than walking the field square by square, find the connected
+    region of such squares around the picked one and grow it by one square
+    to pick up its border.
+    """
+    update_matrix = np.zeros(flagged.shape, dtype=bool)
+    update_matrix[row_idx, col_idx] = True
+
+    unrevealed = ~revealed
+    spreads = adjacent_flags >= adjacency_matrix
+    if not spreads[row_idx, col_idx]:
+        return update_matrix
+
+    # Already revealed or flagged squares don't carry the cascade any further.
+    spreadable = spreads & unrevealed & ~flagged
+    spreadable[row_idx, col_idx] = True
+    labels, _ = label(spreadable, structure=_NEIGHBORHOOD)
+    region = labels == labels[row_idx, col_idx]
+    reached = binary_dilation(region, structure=_NEIGHBORHOOD)
 
+    update_matrix |= reached & unrevealed & ~flagged
     return update_matrix
 
 
-def update_revelation_matrix(mines, flagged, adjacency_matrix, revealed, row_idx, col_idx):
+def _flood_reveal_stacked(flagged, adjacent_flags, adjacency_matrix, revealed, row_idx, col_idx):
     """
-    Given the picked square, update the revelation matrix
-    accordingly. This assumes that the picked square is 
-    not mined. Of course, never reveal an actual mine when
-    doing this.
+    Same as ``_flood_reveal_labelled``, but as a depth-first walk over an
+    array-backed stack, so that it only touches the squares it reveals. This
+    is only fast once compiled with numba.
     """
-    to_test = list(product(
-        range(row_idx - 1, row_idx + 2), 
-        range(col_idx - 1, col_idx + 2)
-    ))
-    rows, cols = adjacency_matrix.shape
-    checked = set((row_idx, col_idx))
-
-    # Perform a depth-first search of the minefield.
-    update_matrix = np.zeros_like(revealed)
-    while len(to_test) > 0:
-        item = to_test.pop()
-        curr_row, curr_col = item
-        # First check if square is in bounds.
-        if (curr_row < 0 or curr_row >= rows) or (curr_col < 0 or curr_col >= cols):
-            checked.add((curr_row, curr_col))
-            continue
-        # Then check if already revealed.
-        elif revealed[curr_row, curr_col]:
-            checked.add((curr_row, curr_col))
+    num_rows, num_cols = flagged.shape
+    update_matrix = np.zeros((num_rows, num_cols), dtype=np.bool_)
+    update_matrix[row_idx, col_idx] = True
+
+    # Squares are marked in the update matrix as they are pushed, so each
+    # one is pushed at most once.
+    stack = np.empty((num_rows * num_cols, 2), dtype=np.int32)
+    stack[0, 0] = row_idx
+    stack[0, 1] = col_idx
+    stack_size = 1
+
+    while stack_size > 0:
+        stack_size -= 1
+        curr_row = stack[stack_size, 0]
+        curr_col = stack[stack_size, 1]
+        if adjacent_flags[curr_row, curr_col] < adjacency_matrix[curr_row, curr_col]:
             continue
-        
-        # If the square has the appropriate number of neighboring mines 
-        # flagged, reveal this square and its neighbors, even if one
-        # of those squares has a mine on it.
-        if adjacency_matrix[curr_row, curr_col] == 0:
-            update_matrix[curr_row, curr_col] = 1
-            to_test.extend([
-                coord for coord in product(
-                    range(curr_row - 1, curr_row + 2),
-                    range(curr_col - 1, curr_col + 2)
+
+        first_row, last_row = max(curr_row - 1, 0), min(curr_row + 2, num_rows)
+        first_col, last_col = max(curr_col - 1, 0), min(curr_col + 2, num_cols)
+
+        for adj_row in range(first_row, last_row):
+            for adj_col in range(first_col, last_col):
+                can_add = not (
+                    update_matrix[adj_row, adj_col] or
+                    revealed[adj_row, adj_col] or
+                    flagged[adj_row, adj_col]
                 )
-                if coord not in checked
-            ])
-        elif mines[curr_row, curr_col] or flagged[curr_row, curr_col]:
-            pass # Do not reveal this square.
-        else:
-            update_matrix[curr_row, curr_col] = 1
-        
-        checked.add((curr_row, curr_col))
-    
+                if can_add:
+                    update_matrix[adj_row, adj_col] = True
+                    stack[stack_size, 0] = adj_row
+                    stack[stack_size, 1] = adj_col
+                    stack_size += 1
+
     return update_matrix
 
 
+# numba is optional. Without it, the labelling approach keeps the work in
+# scipy rather than in an interpreted loop.
+if numba is not None:
+    _flood_reveal = numba.njit(cache=True)(_flood_reveal_stacked)
+else:
+    _flood_reveal = _flood_reveal_labelled
+
+
 class Field:
 
     def __init__(self, num_rows, num_cols, mine_ratio):
         self.rows, self.cols = num_rows, num_cols
         self.mine_ratio = mine_ratio
 
-        self._revealed = np.zeros((num_rows, num_cols), dtype=int)
+        self._revealed = np.zeros((num_rows, num_cols), dtype=bool)
         self._mines = None
         self._adjacency_matrix = None
+        self._adjacency_strings = None
         self._flagged = np.zeros_like(self._revealed)
+        # Number of flags around each square, kept up to date as flags are
+        # toggled so that picks don't have to count them.
+        self._adjacent_flags = np.zeros((num_rows, num_cols), dtype=int)
+
+        # Running tallies, so that checking for a win doesn't need a pass
+        # over the whole field.
+        self._num_mines = None
+        self._num_revealed_safe = 0
+        self._hit_mine = False
+
+        # Bumped whenever the field changes, so that renderers know to redraw.
+        self._version = 0
 
     @classmethod
     def from_mine_matrix(cls, mines):
@@ -155,8 +195,7 @@ class Field:
             num_cols=cols,
             mine_ratio=mine_ratio
         )
-        to_return._mines = np.array(mines)
-        to_return.adjacency_matrix = generate_adjacency_matrix(mines)
+        to_return._lay_mines(np.array(mines, dtype=bool))
 
         return to_return
 
@@ -164,12 +203,28 @@ class Field:
     def initialized(self):
         return self._adjacency_matrix is not None and self._mines is not None
 
+    def _lay_mines(self, mines):
+        """
+        Set the mine matrix along with everything derived from it. The
+        adjacency counts are also kept as strings, since they don't change
+        for the rest of the game and are needed on every redraw.
+        """
+        self._mines = mines
+        self._num_mines = int(np.count_nonzero(mines))
+        self._adjacency_matrix = generate_adjacency_matrix(mines)
+        self._adjacency_strings = np.char.mod(
+            '%d', self._adjacency_matrix
+        ).astype('<U1')
+
     def _initialize(self, row_idx, col_idx):
         """Ensure that the first pick does not kill the player."""
-        self._mines = initialize_mines(self.rows, self.cols, self.mine_ratio)
-        while self._mines[row_idx, col_idx]:
-            self._mines = initialize_mines(self.rows, self.cols, self.mine_ratio)
-        self._adjacency_matrix = generate_adjacency_matrix(self._mines)
+        mines = initialize_mines(self.rows, self.cols, self.mine_ratio)
+        if mines[row_idx, col_idx]:
+            # Move the mine somewhere else instead of re-rolling the field.
+            empty_squares = np.flatnonzero(~mines)
+            mines.flat[_RNG.choice(empty_squares)] = True
+            mines[row_idx, col_idx] = False
+        self._lay_mines(mines)
 
     def pick_square(self, row_idx, col_idx, auto_reveal):
         """
@@ -186,12 +241,30 @@ class Field:
             revealed=self._revealed,
             row_idx=row_idx, 
             col_idx=col_idx,
-            auto_reveal=auto_reveal
+            auto_reveal=auto_reveal,
+            adjacent_flags=self._adjacent_flags
         )
+        # If we revealed any mines, fail the game. Only the squares touched by
+        # this pick need checking.
+        newly_revealed = revelation_update & ~self._revealed
+        hit_mine = bool(np.any(self._mines & revelation_update))
+        self._num_revealed_safe += int(np.count_nonzero(newly_revealed & ~self._mines))
+        self._hit_mine |= hit_mine
         self._revealed |= revelation_update
+        self._version += 1
+
+        return not hit_mine
 
-        # If we revealed any mines, fail the game.
-        return not np.any(self._mines * self._revealed)
+    @property
+    def is_won(self):
+        """
+        The game is won once every square without a mine has been revealed,
+        without ever revealing a mine.
+        """
+        if not self.initialized or self._hit_mine:
+            return False
+
+        return self._num_revealed_safe == self.rows * self.cols - self._num_mines
 
     def toggle_flag_square(self, row_idx, col_idx):
         """
@@ -199,7 +272,16 @@ class Field:
         don't do anything.
         """
         if not self._revealed[row_idx, col_idx]:
-            self._flagged[row_idx, col_idx] = (self._flagged[row_idx, col_idx] + 1) % 2
+            self._flagged[row_idx, col_idx] = not self._flagged[row_idx, col_idx]
+            self._adjacent_flags[
+                max(row_idx - 1, 0):row_idx + 2,
+                max(col_idx - 1, 0):col_idx + 2
+            ] += 1 if self._flagged[row_idx, col_idx] else -1
+            self._version += 1
+
+    @property
+    def version(self):
+        return self._version
 
     @property
     def revealed(self):
@@ -213,6 +295,10 @@ class Field:
     def adjacency_matrix(self):
         return self._adjacency_matrix
     
+    @property
+    def adjacency_strings(self):
+        return self._adjacency_strings
+
     @property
     def flagged(self):
         return self._flagged